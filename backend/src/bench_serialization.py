@@ -0,0 +1,70 @@
+"""Benchmark of GET /all-expenses, as served through the test client, against the
+route as it was before the column projection: ORM objects + to_dict() + jsonify.
+
+    python backend/src/bench_serialization.py --rows 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def best_of(repeats, function):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list serialization paths on a large expense list.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of expenses to list.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per path, the fastest is reported.")
+    args = parser.parse_args()
+
+    # The app reads its config at import, so point it at a throwaway database first
+    database_dir = tempfile.mkdtemp(prefix="trackwise-bench-")
+    os.environ["DB_URI"] = f"sqlite:///{os.path.join(database_dir, 'bench.db')}"
+    os.environ.setdefault("FLASK_KEY", "bench-secret")
+
+    from flask import jsonify
+    from flask_login import current_user
+    from main import app, db, User, Expenses
+
+    @app.route("/bench/orm-expenses", methods=["GET"])
+    def orm_expenses():
+        """The list route before column projection, kept here as the baseline."""
+        expenses = db.session.execute(db.select(Expenses).where(Expenses.users_id == current_user.get_id())).scalars().all()
+        return jsonify(success={"expenses": [expense.to_dict() for expense in expenses]})
+
+    client = app.test_client()
+    client.post("/sign-in", query_string={"name": "bench", "email": "bench@trackwise.test", "password": "bench"})
+
+    categories = ["Food & Groceries", "Shopping & Entertainment", "Housing & Rent", "Transport", "Health & Personal"]
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).where(User.email == "bench@trackwise.test")).scalar()
+        db.session.execute(db.insert(Expenses), [{
+            "cost": round(random.uniform(1, 200), 2),
+            "date": f"{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2024",
+            "time": "12:00:00",
+            "category": random.choice(categories),
+            "users_id": user_id,
+        } for _ in range(args.rows)])
+        db.session.commit()
+
+    print(f"{args.rows} rows, best of {args.repeats}")
+    for encoding in ["identity", "gzip"]:
+        headers = {"Accept-Encoding": encoding}
+        orm_time, orm_response = best_of(args.repeats, lambda: client.get("/bench/orm-expenses", headers=headers))
+        route_time, route_response = best_of(args.repeats, lambda: client.get("/all-expenses", headers=headers))
+        print(f"Accept-Encoding {encoding}:")
+        print(f"  before (ORM + to_dict + jsonify): {orm_time * 1000:8.1f} ms  {len(orm_response.get_data()):>10} bytes")
+        print(f"  GET /all-expenses:                {route_time * 1000:8.1f} ms  "
+              f"{len(route_response.get_data()):>10} bytes  ({orm_time / route_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Load test for the Trackwise API.
+
+Starts the app under werkzeug's threaded WSGI server on localhost against a
+throwaway SQLite database and drives simulated users through it, each with
+its own Flask-Login session cookie. The measured window only opens once
+every user has signed in, and sign-in/login are reported apart from it.
+
+    python backend/src/load_test.py --users 20 --duration 30 --mix expense=4,income=2,dashboard=3,budget=1
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode
+
+CATEGORIES = ["Food & Groceries", "Shopping & Entertainment", "Housing & Rent", "Transport", "Health & Personal"]
+INCOME_CATEGORIES = ["Salary", "Freelance", "Gifts"]
+
+
+class Stats:
+    """Collects latencies and outcomes from every worker thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.setup_latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_timeouts = 0
+
+    def record(self, action, latency, ok, setup=False):
+        with self.lock:
+            (self.setup_latencies if setup else self.latencies)[action].append(latency)
+            if not ok:
+                self.errors[action] += 1
+
+    def record_lock_timeout(self):
+        with self.lock:
+            self.lock_timeouts += 1
+
+
+class Session:
+    """One simulated user with their own cookie jar."""
+
+    def __init__(self, base_url, user_number, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.email = f"load-user-{user_number}@trackwise.test"
+        self.password = "load-test-password"
+        self.budget_number = 0
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def call(self, action, method, path, setup=False, **params):
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urlencode(params)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, method=method), timeout=30) as response:
+                body = response.read()
+                ok = 200 <= response.status < 300
+        except urllib.error.HTTPError as error:
+            body = error.read()
+            ok = False
+        except OSError:
+            body = b""
+            ok = False
+        self.stats.record(action, time.perf_counter() - started, ok, setup)
+        return body
+
+    def sign_in(self):
+        self.call("sign-in", "POST", "/sign-in", setup=True,
+                  name=self.email.split("@")[0], email=self.email, password=self.password)
+        self.call("logout", "POST", "/logout", setup=True)
+        self.call("login", "POST", "/login", setup=True, email=self.email, password=self.password)
+
+    def expense_burst(self):
+        for _ in range(random.randint(1, 5)):
+            self.call("add-expense", "POST", "/add-expense",
+                      cost=round(random.uniform(1, 120), 2), category=random.choice(CATEGORIES))
+
+    def income_burst(self):
+        for _ in range(random.randint(1, 3)):
+            self.call("add-income", "POST", "/add-income",
+                      cost=round(random.uniform(50, 3000), 2), category=random.choice(INCOME_CATEGORIES))
+
+    def dashboard(self):
+        self.call("all-expenses", "GET", "/all-expenses")
+        self.call("all-incomes", "GET", "/all-incomes")
+
+    def budget_check(self):
+        if not self.budget_number or random.random() < 0.2:
+            # Budget categories are unique across users, so make one per user and budget
+            self.budget_number += 1
+            self.call("add-budget", "POST", "/add-budget", limit=random.randint(50, 500),
+                      category=f"{self.email}-{self.budget_number}", time_frame="monthly")
+        self.call("all-budgets", "GET", "/all-budgets")
+
+
+ACTIONS = {
+    "expense": Session.expense_burst,
+    "income": Session.income_burst,
+    "dashboard": Session.dashboard,
+    "budget": Session.budget_check,
+}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {name}, pick from {', '.join(ACTIONS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+class Window:
+    """The measured part of the run, opened by the last user to finish signing in."""
+
+    def __init__(self, users, duration):
+        self.duration = duration
+        self.started = None
+        self.barrier = threading.Barrier(users, action=self.open)
+
+    def open(self):
+        self.started = time.monotonic()
+
+    @property
+    def deadline(self):
+        return self.started + self.duration
+
+
+def run_user(base_url, user_number, stats, args, window):
+    session = Session(base_url, user_number, stats)
+    try:
+        session.sign_in()
+    finally:
+        window.barrier.wait()
+    names = list(args.mix.keys())
+    weights = list(args.mix.values())
+    while time.monotonic() < window.deadline:
+        ACTIONS[random.choices(names, weights)[0]](session)
+        time.sleep(random.uniform(args.think_min, args.think_max))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def print_endpoints(stats, latencies_by_action):
+    for action in sorted(latencies_by_action):
+        latencies = sorted(latencies_by_action[action])
+        print(f"{action:<14}{len(latencies):>10}{stats.errors[action]:>8}"
+              f"{percentile(latencies, 0.5) * 1000:>10.1f}{percentile(latencies, 0.9) * 1000:>10.1f}"
+              f"{percentile(latencies, 0.99) * 1000:>10.1f}{latencies[-1] * 1000:>10.1f}")
+
+
+def report(stats, elapsed):
+    header = f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print("Setup, not counted below:")
+    print(header)
+    print_endpoints(stats, stats.setup_latencies)
+    print()
+    print("Measured window:")
+    print(header)
+    print_endpoints(stats, stats.latencies)
+
+    all_latencies = sorted(latency for latencies in stats.latencies.values() for latency in latencies)
+    total_errors = sum(stats.errors[action] for action in stats.latencies)
+    print()
+    print(f"Requests:        {len(all_latencies)} in {elapsed:.1f}s ({len(all_latencies) / elapsed:.1f} req/s)")
+    print(f"Latency:         p50 {percentile(all_latencies, 0.5) * 1000:.1f} ms, "
+          f"p90 {percentile(all_latencies, 0.9) * 1000:.1f} ms, p99 {percentile(all_latencies, 0.99) * 1000:.1f} ms")
+    print(f"Error rate:      {total_errors / max(len(all_latencies), 1) * 100:.2f}% ({total_errors} errors)")
+    print(f"DB lock timeouts: {stats.lock_timeouts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated users against the Trackwise API.")
+    parser.add_argument("--users", type=int, default=10, help="Number of concurrent simulated users.")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="Seconds each user keeps sending requests, counted from when all have signed in.")
+    parser.add_argument("--think-min", type=float, default=0.05, help="Minimum pause between actions, in seconds.")
+    parser.add_argument("--think-max", type=float, default=0.5, help="Maximum pause between actions, in seconds.")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("expense=4,income=2,dashboard=3,budget=1"),
+                        help="Relative weights of the actions, e.g. expense=4,income=2,dashboard=3,budget=1")
+    parser.add_argument("--port", type=int, default=0, help="Port to serve on, 0 picks a free one.")
+    args = parser.parse_args()
+
+    # The app reads its config at import, so point it at a throwaway database first
+    database_dir = tempfile.mkdtemp(prefix="trackwise-load-")
+    os.environ["DB_URI"] = f"sqlite:///{os.path.join(database_dir, 'load-test.db')}"
+    os.environ.setdefault("FLASK_KEY", "load-test-secret")
+
+    from sqlalchemy import event
+    from werkzeug.serving import make_server
+    from main import app, db
+
+    stats = Stats()
+    with app.app_context():
+        @event.listens_for(db.engine, "handle_error")
+        def count_lock_timeouts(context):
+            if "database is locked" in str(context.original_exception):
+                stats.record_lock_timeout()
+
+    # Keep werkzeug's per-request log lines out of the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"Serving on {base_url}, database in {database_dir}")
+    print(f"{args.users} users for {args.duration:.0f}s, mix {args.mix}")
+
+    window = Window(args.users, args.duration)
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        users = [pool.submit(run_user, base_url, user_number, stats, args, window) for user_number in range(args.users)]
+        for user in users:
+            user.result()
+    elapsed = time.monotonic() - window.started
+    server.shutdown()
+
+    print()
+    report(stats, elapsed)
+
+
+if __name__ == "__main__":
+    main()
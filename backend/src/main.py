@@ -1,13 +1,22 @@
 import pandas as pd
-from flask import Flask, request, jsonify
+import click
+from flask import Flask, request, jsonify, session, abort, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Float, ForeignKey
+from sqlalchemy import Integer, String, Float, ForeignKey, event, inspect, text
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 import os
-from datetime import datetime
+import gzip
+import json
+import sqlite3
+import zlib
+import math
+import calendar
+from functools import lru_cache
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 load_dotenv()
 
 class Base(DeclarativeBase):
@@ -18,13 +27,85 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('FLASK_KEY')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_URI', 'sqlite:///track-wise.db')
+# Optional read replica, e.g. DB_REPLICA_URI=sqlite:///track-wise-replica.db for local testing
+if os.environ.get('DB_REPLICA_URI'):
+    app.config['SQLALCHEMY_BINDS'] = {'replica': os.environ.get('DB_REPLICA_URI')}
+# How long after a user's own write their reads stay on the primary (read-your-writes)
+app.config['REPLICA_LAG_SECONDS'] = float(os.environ.get('REPLICA_LAG_SECONDS', 5))
+# Transactions older than this are moved out of the hot tables by `flask archive`
+app.config['ARCHIVE_HORIZON_DAYS'] = int(os.environ.get('ARCHIVE_HORIZON_DAYS', 365))
+app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+# JSON responses larger than this many bytes are compressed when the client accepts it
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+# Recurring transactions may not start further back than this, it bounds the first materialization
+app.config['RECURRING_MAX_BACKFILL_DAYS'] = int(os.environ.get('RECURRING_MAX_BACKFILL_DAYS', 366))
+# Timezone for users who haven't sent one at sign-in/login, the server's own when unset
+app.config['DEFAULT_TIMEZONE'] = os.environ.get('DEFAULT_TIMEZONE')
 db.init_app(app)
 
-formatted_date = str(datetime.today().strftime('%d/%m/%Y'))
-time = str(datetime.today().time())
-formatted_time = time.split(".")[0]
-week_number = datetime.today().isocalendar()[1]
-month_number = datetime.today().month
+
+def timezone_for(name):
+    """The ZoneInfo for an IANA timezone name (e.g. Europe/London), None if empty or unknown."""
+    try:
+        return ZoneInfo(name) if name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def user_timezone():
+    """The logged in user's timezone, else the default one (None means server local time)."""
+    name = None
+    if has_request_context() and current_user.is_authenticated:
+        name = current_user.timezone
+    return timezone_for(name or app.config['DEFAULT_TIMEZONE'])
+
+
+def now():
+    """The current time in the user's timezone, read once per request so a request sees a single "now".
+    Cached on the request itself, as the analytics push app contexts of their own with a fresh g."""
+    if not has_request_context():
+        return datetime.now(user_timezone())
+    if "trackwise.now" not in request.environ:
+        request.environ["trackwise.now"] = datetime.now(user_timezone())
+    return request.environ["trackwise.now"]
+
+
+def current_date():
+    return now().strftime("%d/%m/%Y")
+
+
+def current_time():
+    return now().strftime("%H:%M:%S")
+
+
+def current_year_week():
+    year, week, _ = now().isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def current_year_month():
+    return now().strftime("%Y-%m")
+
+
+@lru_cache(maxsize=None)
+def calendar_table(first_year, last_year):
+    """Day -> ISO year-week and year-month lookup for whole years, indexed by dd/mm/YYYY dates."""
+    days = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-31", freq="D")
+    iso = days.isocalendar()
+    return pd.DataFrame({
+        "year_week": (iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)).to_numpy(),
+        "year_month": days.strftime("%Y-%m"),
+        "month_name": days.strftime("%B %Y"),
+    }, index=days.strftime("%d/%m/%Y"))
+
+
+def with_calendar(df):
+    """Joins the calendar lookup onto a frame with a dd/mm/YYYY "date" column."""
+    if df.empty:
+        return df.assign(year_week=pd.Series(dtype=str), year_month=pd.Series(dtype=str), month_name=pd.Series(dtype=str))
+    years = df["date"].str[-4:].astype(int)
+    # Reach one year either side so ISO weeks spilling across new year resolve
+    return df.join(calendar_table(int(years.min()) - 1, int(years.max()) + 1), on="date")
 
 
 # Tables
@@ -35,6 +116,7 @@ class User(db.Model, UserMixin):
     email: Mapped[str] = mapped_column(String(250), nullable=False, unique=True)
     password: Mapped[str] = mapped_column(String(250), nullable=False)
     creation_date: Mapped[str] = mapped_column(String(250), nullable=False)
+    timezone: Mapped[str] = mapped_column(String(250), nullable=True) #IANA name, e.g. Europe/London
 
     #expenses relationship
     expenses = relationship("Expenses", back_populates="user")
@@ -45,6 +127,9 @@ class User(db.Model, UserMixin):
     #Budgets relationship
     budgets = relationship("Budgets", back_populates="user")
 
+    #Recurring transactions relationship
+    recurring_transactions = relationship("RecurringTransactions", back_populates="user")
+
 
 class Expenses(db.Model):
     __tablename__ = 'expenses'
@@ -92,9 +177,407 @@ class Budgets(db.Model):
     def to_dict(self):
         return {column.name: getattr(self, column.name) for column in self.__table__.columns}
 
+
+class TransactionSummaries(db.Model):
+    """Per day and category totals of archived transactions, so analytics stay exact."""
+    __tablename__ = 'transaction_summaries'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(250), nullable=False) #expenses, incomes
+    date: Mapped[str] = mapped_column(String(250), nullable=False)
+    category: Mapped[str] = mapped_column(String(250), nullable=False)
+    cost: Mapped[float] = mapped_column(Float, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    users_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
+
+
+class RecurringTransactions(db.Model):
+    """Salaries, rent, subscriptions... Occurrences are written into expenses/incomes lazily."""
+    __tablename__ = 'recurring_transactions'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(250), nullable=False) #expenses, incomes
+    cost: Mapped[float] = mapped_column(Float, nullable=False)
+    category: Mapped[str] = mapped_column(String(250), nullable=False)
+    frequency: Mapped[str] = mapped_column(String(250), nullable=False) #daily, weekly, monthly or "day-of-month month day-of-week"
+    start_date: Mapped[str] = mapped_column(String(250), nullable=False)
+    time: Mapped[str] = mapped_column(String(250), nullable=False)
+    # Last date whose occurrences have been written, None until the first materialization
+    materialized_until: Mapped[str] = mapped_column(String(250), nullable=True)
+
+    #relationship with User
+    users_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
+    user = relationship("User", back_populates="recurring_transactions")
+
+
+# Transaction tables by kind, used by the archive and recurring transactions
+TRANSACTION_TABLES = {"expenses": Expenses, "incomes": Incomes}
+
 with app.app_context():
     db.create_all()
     engine = db.engine
+    # Databases created before users had a timezone get the column added in place
+    if "timezone" not in {column["name"] for column in inspect(engine).get_columns("users")}:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE users ADD COLUMN timezone VARCHAR(250)"))
+    if "replica" in db.engines:
+        # Give a fresh replica the schema so reads don't fail before its first sync
+        db.metadata.create_all(db.engines["replica"])
+
+
+def mark_recent_write():
+    """Stamps the user's session after they write, so their next reads go to the primary."""
+    if has_request_context():
+        session["last_write"] = datetime.now().timestamp()
+
+
+@event.listens_for(db.session, "after_flush")
+def remember_write(session_, flush_context):
+    mark_recent_write()
+
+
+def read_engine():
+    """Returns the engine reads should use: the replica if configured, else the primary.
+    Falls back to the primary for a short while after the user's own writes."""
+    replica = db.engines.get("replica")
+    if replica is None:
+        return db.engine
+    if has_request_context():
+        last_write = session.get("last_write")
+        if last_write and datetime.now().timestamp() - last_write < app.config['REPLICA_LAG_SECONDS']:
+            return db.engine
+    return replica
+
+
+def projection(model):
+    """Precompiles a plain column select for a model and the mapper turning its rows into dicts,
+    so list routes don't build ORM objects just to call to_dict() on them."""
+    columns = tuple(model.__table__.columns)
+    keys = tuple(column.name for column in columns)
+    return columns, lambda row: dict(zip(keys, row))
+
+
+EXPENSE_COLUMNS, expense_row = projection(Expenses)
+INCOME_COLUMNS, income_row = projection(Incomes)
+BUDGET_COLUMNS, budget_row = projection(Budgets)
+RECURRING_COLUMNS, recurring_row = projection(RecurringTransactions)
+
+
+def json_response(status=200, **payload):
+    """Serializes straight to JSON bytes, gzip/deflate compressing large bodies if the client accepts it."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    response = app.response_class(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if len(body) >= app.config['COMPRESS_MIN_SIZE']:
+        encoding = request.accept_encodings.best_match(["gzip", "deflate"])
+        if encoding == "gzip":
+            response.set_data(gzip.compress(body, compresslevel=6))
+        elif encoding == "deflate":
+            response.set_data(zlib.compress(body, 6))
+        if encoding:
+            response.content_encoding = encoding
+    return response
+
+
+@app.cli.command("sync-replica")
+def sync_replica():
+    """Copies the primary SQLite database onto the replica (local stand-in for replication)."""
+    replica = db.engines.get("replica")
+    if replica is None:
+        click.echo("No replica configured, set DB_REPLICA_URI")
+        return
+    if db.engine.url.get_backend_name() != "sqlite" or replica.url.get_backend_name() != "sqlite":
+        click.echo("Replica sync is only needed for SQLite, other databases replicate themselves")
+        return
+    source = sqlite3.connect(db.engine.url.database)
+    target = sqlite3.connect(replica.url.database)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    click.echo(f"Replica synced from {db.engine.url.database}")
+
+
+def archive_user_dir(table_name, users_id):
+    """Each user's archive lives in its own directory, so reading it never touches other users' rows."""
+    return os.path.join(app.config['ARCHIVE_DIR'], table_name, str(int(users_id)))
+
+
+def parse_date_arg(name):
+    """Parses an optional dd/mm/YYYY query argument."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, "%d/%m/%Y")
+
+
+def in_date_range(date, start=None, end=None):
+    if start is None and end is None:
+        return True
+    parsed_date = datetime.strptime(date, "%d/%m/%Y")
+    return (start is None or parsed_date >= start) and (end is None or parsed_date <= end)
+
+
+def read_archive(table_name, users_id, start=None, end=None):
+    """Returns a user's archived transactions in the given range.
+    Only the user's yearly archive files the range reaches into are opened."""
+    if users_id is None:
+        return []
+    user_dir = archive_user_dir(table_name, users_id)
+    if not os.path.isdir(user_dir):
+        return []
+    archived_rows = []
+    for file_name in sorted(os.listdir(user_dir)):
+        # Files are named <year>-<archive run>.ndjson.gz, unfinished runs end in .tmp
+        if not file_name.endswith(".ndjson.gz"):
+            continue
+        year = int(file_name.split("-")[0])
+        if (start and year < start.year) or (end and year > end.year):
+            continue
+        with gzip.open(os.path.join(user_dir, file_name), "rt") as archive_file:
+            for line in archive_file:
+                row = json.loads(line)
+                if in_date_range(row["date"], start, end):
+                    archived_rows.append(row)
+    return archived_rows
+
+
+def read_transactions(table_name, forecast_until=None):
+    """Reads a transaction table for analytics: the hot rows plus one row per archived
+    day and category from the summaries, so period totals and breakdowns stay exact.
+    With forecast_until, recurring occurrences up to that date are projected in without being written."""
+    if has_request_context() and current_user.is_authenticated:
+        materialize_recurring(current_user.get_id())
+    df_hot = pd.read_sql_table(table_name, read_engine())
+    df_cold = pd.read_sql_query(
+        db.select(TransactionSummaries.cost, TransactionSummaries.date, TransactionSummaries.category,
+                  TransactionSummaries.users_id).where(TransactionSummaries.kind == table_name),
+        read_engine())
+    frames = [df_hot, df_cold]
+    if forecast_until:
+        frames.append(pd.DataFrame(projected_transactions(table_name, forecast_until, current_user.get_id())))
+    frames = [frame for frame in frames if not frame.empty]
+    if len(frames) < 2:
+        return df_hot if not frames else frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def start_of_today():
+    return now().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def parse_cron_field(field, low, high):
+    """Parses one cron field (*, 5, 1-5, */2, 1,15) into the set of values it matches."""
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            first, last = (int(value) for value in part.split("-"))
+        else:
+            first = last = int(part)
+        if first < low or last > high or first > last or (step and int(step) < 1):
+            raise ValueError(f"Invalid cron field {field}")
+        values.update(range(first, last + 1, int(step or 1)))
+    return values
+
+
+def parse_frequency(frequency):
+    """Returns daily, weekly or monthly as is, or the parsed (days, months, weekdays, either) of a
+    cron-like "day-of-month month day-of-week" schedule. Raises ValueError if it is neither."""
+    if frequency in ("daily", "weekly", "monthly"):
+        return frequency
+    fields = frequency.split()
+    if len(fields) != 3:
+        raise ValueError(f"Invalid frequency {frequency}")
+    # Cron counts weekdays from Sunday (0 or 7), Python from Monday
+    weekdays = {(weekday - 1) % 7 for weekday in parse_cron_field(fields[2], 0, 7)}
+    # As in cron, when both day-of-month and day-of-week are restricted a day matching either counts
+    either = fields[0] != "*" and fields[2] != "*"
+    return parse_cron_field(fields[0], 1, 31), parse_cron_field(fields[1], 1, 12), weekdays, either
+
+
+def occurrence_dates(rule, after, until):
+    """Yields the dates a recurring rule falls on, after `after` (if given) and up to `until`."""
+    start = datetime.strptime(rule.start_date, "%d/%m/%Y")
+    first_day = max(start, after + timedelta(days=1)) if after else start
+    frequency = parse_frequency(rule.frequency)
+    if frequency == "daily":
+        day = first_day
+        while day <= until:
+            yield day
+            day += timedelta(days=1)
+    elif frequency == "weekly":
+        # First whole number of weeks from the start that lands on or after first_day
+        day = start + timedelta(weeks=-(-(first_day - start).days // 7))
+        while day <= until:
+            yield day
+            day += timedelta(weeks=1)
+    elif frequency == "monthly":
+        months = 0
+        while True:
+            year, month = divmod(start.month - 1 + months, 12)
+            year, month = start.year + year, month + 1
+            # Rules starting on the 31st fall on the last day of shorter months
+            day = start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+            if day > until:
+                break
+            if day >= first_day:
+                yield day
+            months += 1
+    else:
+        days, months, weekdays, either = frequency
+        day = first_day
+        while day <= until:
+            day_match = day.day in days
+            weekday_match = day.weekday() in weekdays
+            if day.month in months and ((day_match or weekday_match) if either else (day_match and weekday_match)):
+                yield day
+            day += timedelta(days=1)
+
+
+def occurrence_rows(rule, dates):
+    return [{
+        "cost": rule.cost,
+        "date": day.strftime("%d/%m/%Y"),
+        "time": rule.time,
+        "category": rule.category,
+        "users_id": rule.users_id,
+    } for day in dates]
+
+
+def materialize_recurring(users_id, until=None):
+    """Writes a user's recurring occurrences due up to `until` (at most today), with one
+    bulk insert per transaction table rather than a row at a time.
+
+    Concurrent requests race for the same rules, so each rule is claimed first by moving
+    materialized_until on from the value we read. Only the request whose update matched
+    inserts the occurrences, in the same transaction as the claim."""
+    until = min(until or start_of_today(), start_of_today())
+    rules = db.session.execute(db.select(RecurringTransactions).where(RecurringTransactions.users_id == users_id)).scalars().all()
+    new_rows = {kind: [] for kind in TRANSACTION_TABLES}
+    claimed_any = False
+    for rule in rules:
+        materialized_until = rule.materialized_until
+        after = datetime.strptime(materialized_until, "%d/%m/%Y") if materialized_until else None
+        if after and after >= until:
+            continue
+        unchanged = (RecurringTransactions.materialized_until.is_(None) if materialized_until is None
+                     else RecurringTransactions.materialized_until == materialized_until)
+        claim = db.session.execute(
+            db.update(RecurringTransactions)
+            .where(RecurringTransactions.id == rule.id, unchanged)
+            .values(materialized_until=until.strftime("%d/%m/%Y"))
+            .execution_options(synchronize_session=False))
+        if claim.rowcount != 1:
+            continue
+        new_rows[rule.kind] += occurrence_rows(rule, occurrence_dates(rule, after, until))
+        claimed_any = True
+    for kind, rows in new_rows.items():
+        if rows:
+            db.session.execute(db.insert(TRANSACTION_TABLES[kind]), rows)
+    if claimed_any:
+        db.session.commit()
+        # Core inserts and updates don't flush, so remember_write never saw these
+        mark_recent_write()
+
+
+def projected_transactions(kind, until, users_id):
+    """Returns future occurrences of a user's recurring rules of a kind up to `until`, without writing them."""
+    rules = db.session.execute(db.select(RecurringTransactions).where(RecurringTransactions.kind == kind,
+                                                                      RecurringTransactions.users_id == users_id),
+                               bind_arguments={"bind": read_engine()}).scalars().all()
+    projected_rows = []
+    for rule in rules:
+        projected_rows += occurrence_rows(rule, occurrence_dates(rule, start_of_today(), until))
+    return projected_rows
+
+
+@app.cli.command("archive")
+@click.option("--days", type=int, default=None, help="Archive transactions older than this many days.")
+def archive_transactions(days):
+    """Moves old expenses and incomes into compressed yearly NDJSON files, one set per user."""
+    horizon = datetime.today() - timedelta(days=days if days is not None else app.config['ARCHIVE_HORIZON_DAYS'])
+    archive_run = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    for table_name, model in TRANSACTION_TABLES.items():
+        recover_archive_files(table_name, model)
+        df_table = pd.read_sql_table(table_name, db.engine)
+        if df_table.empty:
+            continue
+        parsed_dates = pd.to_datetime(df_table["date"], format="%d/%m/%Y")
+        df_old = df_table[parsed_dates < horizon]
+        if df_old.empty:
+            continue
+
+        # Fold the old rows into the summaries before they leave the hot table
+        existing_summaries = {
+            (summary.users_id, summary.date, summary.category): summary
+            for summary in db.session.execute(
+                db.select(TransactionSummaries).where(TransactionSummaries.kind == table_name)).scalars()
+        }
+        grouped = df_old.groupby(["users_id", "date", "category"]).cost.agg(["sum", "count"])
+        for (users_id, date, category), row in grouped.iterrows():
+            summary = existing_summaries.get((users_id, date, category))
+            if summary:
+                summary.cost += float(row["sum"])
+                summary.count += int(row["count"])
+            else:
+                db.session.add(TransactionSummaries(
+                    kind=table_name,
+                    date=date,
+                    category=category,
+                    cost=float(row["sum"]),
+                    count=int(row["count"]),
+                    users_id=int(users_id),
+                ))
+
+        old_ids = df_old["id"].tolist()
+        for i in range(0, len(old_ids), 500):
+            db.session.execute(db.delete(model).where(model.id.in_(old_ids[i:i + 500])))
+        db.session.flush()
+
+        # Write this run's files under a .tmp name and only publish them once the delete is committed
+        temporary_paths = []
+        try:
+            for (users_id, year), df_year in df_old.groupby(["users_id", parsed_dates[df_old.index].dt.year]):
+                user_dir = archive_user_dir(table_name, users_id)
+                os.makedirs(user_dir, exist_ok=True)
+                temporary_path = os.path.join(user_dir, f"{year}-{archive_run}.ndjson.gz.tmp")
+                with gzip.open(temporary_path, "wt") as archive_file:
+                    for row in df_year.to_dict("records"):
+                        archive_file.write(json.dumps(row) + "\n")
+                temporary_paths.append(temporary_path)
+        except OSError:
+            db.session.rollback()
+            for temporary_path in temporary_paths:
+                os.remove(temporary_path)
+            raise
+        db.session.commit()
+        for temporary_path in temporary_paths:
+            os.replace(temporary_path, temporary_path.removesuffix(".tmp"))
+        click.echo(f"Archived {len(df_old)} {table_name} older than {horizon.strftime('%d/%m/%Y')}")
+
+
+def recover_archive_files(table_name, model):
+    """Finishes or discards .tmp archive files left by a run that died around its commit.
+    If their rows are gone from the hot table the commit happened and the file is published,
+    otherwise it is dropped and the rows get archived again."""
+    table_dir = os.path.join(app.config['ARCHIVE_DIR'], table_name)
+    if not os.path.isdir(table_dir):
+        return
+    for user_dir_name in os.listdir(table_dir):
+        user_dir = os.path.join(table_dir, user_dir_name)
+        for file_name in os.listdir(user_dir):
+            if not file_name.endswith(".tmp"):
+                continue
+            temporary_path = os.path.join(user_dir, file_name)
+            with gzip.open(temporary_path, "rt") as archive_file:
+                ids = [json.loads(line)["id"] for line in archive_file]
+            still_hot = ids and db.session.execute(
+                db.select(model.id).where(model.id.in_(ids[:500]))).first()
+            if still_hot:
+                os.remove(temporary_path)
+            else:
+                os.replace(temporary_path, temporary_path.removesuffix(".tmp"))
 
 
 
@@ -113,8 +596,8 @@ def home():
 
 @app.route("/sign-in", methods=["GET","POST"])
 def sign_in():
-    global formatted_date
     name = request.args.get("name")
+    user_timezone_name = request.args.get("timezone") if timezone_for(request.args.get("timezone")) else None
     hashed_and_salted_password = generate_password_hash(request.args.get("password"), method="pbkdf2:sha256", salt_length=8)
     user_email = request.args.get("email")
     check_email = db.session.execute(db.select(User).where(User.email == user_email)).first()
@@ -126,8 +609,8 @@ def sign_in():
         name=name,
         password=hashed_and_salted_password,
         email=user_email,
-        creation_date=formatted_date,
-
+        creation_date=datetime.now(timezone_for(user_timezone_name) or user_timezone()).strftime("%d/%m/%Y"),
+        timezone=user_timezone_name,
         )
 
     db.session.add(new_user)
@@ -154,6 +637,9 @@ def login():
         }), 401
 
     else:
+        if timezone_for(request.args.get("timezone")):
+            user.timezone = request.args.get("timezone")
+            db.session.commit()
         login_user(user)
         return jsonify(success={
             "message": f"You have successfully logged in. Welcome back {current_user.name}!"
@@ -173,14 +659,13 @@ def logout():
 @app.route("/add-expense", methods=["POST"])
 @login_required
 def add_expense():
-    global formatted_date, formatted_time
     expense_cost = request.args.get("cost")
     expense_category = request.args.get("category")
 
     new_expense = Expenses(
         cost=expense_cost,
-        date=formatted_date,
-        time=formatted_time,
+        date=current_date(),
+        time=current_time(),
         category = expense_category,
         user = current_user
     )
@@ -212,14 +697,26 @@ def edit_expense(expense_id):
 
 @app.route("/all-expenses", methods=["GET"])
 def all_expenses():
-    expenses = db.session.execute(db.select(Expenses).where(Expenses.users_id == current_user.get_id())).scalars().all()
-    all_user_expenses = [expense.to_dict() for expense in expenses]
+    try:
+        start = parse_date_arg("start")
+        end = parse_date_arg("end")
+    except ValueError:
+        return jsonify(error={
+            "message": "start and end must be dd/mm/YYYY dates"
+        }), 422
+    materialize_recurring(current_user.get_id(), end)
+    expenses = db.session.execute(db.select(*EXPENSE_COLUMNS).where(Expenses.users_id == current_user.get_id()), bind_arguments={"bind": read_engine()})
+    if start or end:
+        all_user_expenses = [expense_row(row) for row in expenses if in_date_range(row.date, start, end)]
+    else:
+        all_user_expenses = [expense_row(row) for row in expenses]
+    all_user_expenses += read_archive("expenses", current_user.get_id(), start, end)
     if all_user_expenses:
-        return jsonify(success={
+        return json_response(success={
             "expenses": all_user_expenses,
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "No expenses found"
         })
 
@@ -227,13 +724,13 @@ def all_expenses():
 @app.route("/expense/<int:expense_id>", methods=["GET"])
 @login_required
 def show_expense(expense_id):
-    specific_expense = db.session.execute(db.select(Expenses).where(Expenses.id == expense_id)).scalar()
+    specific_expense = db.session.execute(db.select(*EXPENSE_COLUMNS).where(Expenses.id == expense_id)).first()
     if specific_expense:
-        return jsonify(success={
-            "budgets": [specific_expense.to_dict()],
+        return json_response(success={
+            "budgets": [expense_row(specific_expense)],
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "No expense found"
         })
 
@@ -254,13 +751,12 @@ def delete_expense(expense_id):
 @app.route("/add-income", methods=["POST"])
 @login_required
 def add_income():
-    global formatted_date, formatted_time
     income_cost = request.args.get("cost")
     income_category = request.args.get("category")
     new_income = Incomes(
         cost=income_cost,
-        date=formatted_date,
-        time=formatted_time,
+        date=current_date(),
+        time=current_time(),
         category = income_category,
         user = current_user
     )
@@ -294,27 +790,39 @@ def edit_income(income_id):
 
 @app.route("/all-incomes", methods=["GET"])
 def all_incomes():
-    incomes = db.session.execute(db.select(Incomes).where(Incomes.users_id == current_user.get_id())).scalars().all()
-    all_user_incomes = [income.to_dict() for income in incomes]
+    try:
+        start = parse_date_arg("start")
+        end = parse_date_arg("end")
+    except ValueError:
+        return jsonify(error={
+            "message": "start and end must be dd/mm/YYYY dates"
+        }), 422
+    materialize_recurring(current_user.get_id(), end)
+    incomes = db.session.execute(db.select(*INCOME_COLUMNS).where(Incomes.users_id == current_user.get_id()), bind_arguments={"bind": read_engine()})
+    if start or end:
+        all_user_incomes = [income_row(row) for row in incomes if in_date_range(row.date, start, end)]
+    else:
+        all_user_incomes = [income_row(row) for row in incomes]
+    all_user_incomes += read_archive("incomes", current_user.get_id(), start, end)
     if all_user_incomes:
-        return jsonify(success={
+        return json_response(success={
             "budgets": all_user_incomes
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "No incomes found"
         })
 
 @app.route("/income/<int:income_id>", methods=["GET"])
 @login_required
 def show_income(income_id):
-    specific_income = db.session.execute(db.select(Incomes).where(Incomes.id == income_id)).scalar()
+    specific_income = db.session.execute(db.select(*INCOME_COLUMNS).where(Incomes.id == income_id)).first()
     if specific_income:
-        return jsonify(success={
-            "info": [specific_income.to_dict()],
+        return json_response(success={
+            "info": [income_row(specific_income)],
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "Income does not exist"
         })
 
@@ -383,27 +891,27 @@ def edit_budget(budget_id):
 @app.route('/all-budgets', methods=["GET"])
 @login_required
 def all_budgets():
-    budgets = db.session.execute(db.select(Budgets).where(Budgets.users_id == current_user.get_id())).scalars().all()
-    all_user_budgets = [budget.to_dict() for budget in budgets]
+    budgets = db.session.execute(db.select(*BUDGET_COLUMNS).where(Budgets.users_id == current_user.get_id()), bind_arguments={"bind": read_engine()})
+    all_user_budgets = [budget_row(row) for row in budgets]
     if all_user_budgets:
-        return jsonify(success={
+        return json_response(success={
             "budgets": all_user_budgets
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "No budgets found"
         })
 
 @app.route('/budget/<int:budget_id>', methods=["GET"])
 @login_required
 def show_budget(budget_id):
-    specific_budget = db.session.execute(db.select(Budgets).where(Budgets.id == budget_id)).scalar()
+    specific_budget = db.session.execute(db.select(*BUDGET_COLUMNS).where(Budgets.id == budget_id)).first()
     if specific_budget:
-        return jsonify(success={
-            "info": [specific_budget.to_dict()],
+        return json_response(success={
+            "info": [budget_row(specific_budget)],
         })
     else:
-        return jsonify(error={
+        return json_response(error={
             "message": "Budget does not exist"
         })
 
@@ -420,14 +928,106 @@ def delete_budget(budget_id):
     })
 
 
-def get_totals_by_period(period):
-    """Gets the total expenses and incomes  and the balance for a given period."""
-    global formatted_date, formatted_time
+
+
+@app.route('/add-recurring', methods=["POST"])
+@login_required
+def add_recurring():
+    recurring_kind = request.args.get("kind")
+    recurring_frequency = request.args.get("frequency", "")
+    recurring_start_date = request.args.get("start_date", current_date())
+    recurring_category = request.args.get("category")
+    if recurring_kind not in TRANSACTION_TABLES:
+        return jsonify(error={
+            "message": "Kind must be expenses or incomes"
+        }), 422
+    if not recurring_category:
+        return jsonify(error={
+            "message": "Category is required"
+        }), 422
+    try:
+        recurring_cost = float(request.args.get("cost", ""))
+        if not math.isfinite(recurring_cost):
+            raise ValueError
+    except ValueError:
+        return jsonify(error={
+            "message": "Cost must be a number"
+        }), 422
+    try:
+        parse_frequency(recurring_frequency)
+        start_date = datetime.strptime(recurring_start_date, "%d/%m/%Y")
+    except ValueError:
+        return jsonify(error={
+            "message": "Frequency must be daily, weekly, monthly or \"day-of-month month day-of-week\", and start_date dd/mm/YYYY"
+        }), 422
+    max_backfill_days = app.config['RECURRING_MAX_BACKFILL_DAYS']
+    if start_date < start_of_today() - timedelta(days=max_backfill_days):
+        return jsonify(error={
+            "message": f"start_date can be at most {max_backfill_days} days in the past"
+        }), 422
+
+    new_recurring = RecurringTransactions(
+        kind=recurring_kind,
+        cost=recurring_cost,
+        category=recurring_category,
+        frequency=recurring_frequency,
+        start_date=recurring_start_date,
+        time=current_time(),
+        user = current_user
+    )
+
+    db.session.add(new_recurring)
+    db.session.commit()
+
+    return jsonify(success={
+        "message": "Recurring transaction added successfully",
+        "info":{
+            "name": new_recurring.user.name,
+            "recurring_kind": new_recurring.kind,
+            "recurring_cost": new_recurring.cost,
+            "recurring_category": new_recurring.category,
+            "recurring_frequency": new_recurring.frequency,
+            "recurring_start_date": new_recurring.start_date,
+        }
+    })
+
+
+@app.route('/all-recurring', methods=["GET"])
+@login_required
+def all_recurring():
+    recurring = db.session.execute(db.select(*RECURRING_COLUMNS).where(RecurringTransactions.users_id == current_user.get_id()), bind_arguments={"bind": read_engine()})
+    all_user_recurring = [recurring_row(row) for row in recurring]
+    if all_user_recurring:
+        return json_response(success={
+            "recurring": all_user_recurring
+        })
+    else:
+        return json_response(error={
+            "message": "No recurring transactions found"
+        })
+
+
+@app.route('/delete-recurring/<int:recurring_id>', methods=["DELETE"])
+@login_required
+def delete_recurring(recurring_id):
+    specific_recurring = db.get_or_404(RecurringTransactions, recurring_id)
+    if specific_recurring.users_id != current_user.id:
+        abort(404)
+    db.session.delete(specific_recurring)
+    db.session.commit()
+    return jsonify(success={
+        "message": "Recurring transaction deleted successfully",
+    })
+
+
+def get_totals_by_period(period, forecast_until=None):
+    """Gets the total expenses and incomes  and the balance for a given period.
+    Pass forecast_until to include projected recurring transactions up to that date."""
     with app.app_context():
-        df_expenses = pd.read_sql_table("expenses", engine)
-        df_incomes = pd.read_sql_table("incomes", engine)
-        expenses = df_expenses[df_expenses["users_id"] == current_user.get_id()].groupby("date").cost.sum()
-        incomes = df_incomes[df_incomes["users_id"] == current_user.get_id()].groupby("date").cost.sum()
+        df_expenses = read_transactions("expenses", forecast_until)
+        df_incomes = read_transactions("incomes", forecast_until)
+        expenses = df_expenses[df_expenses["users_id"] == int(current_user.get_id())].groupby("date").cost.sum()
+        incomes = df_incomes[df_incomes["users_id"] == int(current_user.get_id())].groupby("date").cost.sum()
         if period == "daily":
             daily_dic_total = {}
 
@@ -456,54 +1056,44 @@ def get_totals_by_period(period):
 
         elif period == "weekly":
             weekly_dic_total = {}
-            for date, total in expenses.items():
-                date_week = datetime.strptime(date, "%d/%m/%Y").isocalendar()[1]
-                if f"Week {date_week}" not in weekly_dic_total.keys():
-                    weekly_dic_total[f"Week {date_week}"] = {
-                        "expenses": total,
-                        "incomes": float(0)
-                    }
-                else:
-                    weekly_dic_total[f"Week {date_week}"]["expenses"] += total
-
-            for date, total in incomes.items():
-                date_week = datetime.strptime(date, "%d/%m/%Y").isocalendar()[1]
-                if f"Week {date_week}" not in weekly_dic_total.keys():
-                    weekly_dic_total[f"Week {date_week}"] = {
+            # Keyed by ISO year-week (e.g. 2026-W42) so the same week of different years stays apart
+            for date_week, total in with_calendar(expenses.reset_index()).groupby("year_week").cost.sum().items():
+                weekly_dic_total[date_week] = {
+                    "expenses": total,
+                    "incomes": float(0)
+                }
+
+            for date_week, total in with_calendar(incomes.reset_index()).groupby("year_week").cost.sum().items():
+                if date_week not in weekly_dic_total.keys():
+                    weekly_dic_total[date_week] = {
                         "expenses": float(0),
                         "incomes": total,
                     }
                 else:
-                    weekly_dic_total[f"Week {date_week}"]["incomes"] += total
+                    weekly_dic_total[date_week]["incomes"] += total
 
             for key in weekly_dic_total.keys():
                 weekly_dic_total[key]["balance"] = weekly_dic_total[key]["incomes"] - weekly_dic_total[key]["expenses"]
             return weekly_dic_total
 
         elif period == "monthly":
-            months_list = ["January", "February", "March", "April", "May", "June", "July", "August",
-                           "September", "October", "November", "December"]
             monthly_dic_total = {}
-            for date, total in expenses.items():
-                date_month = int(date.split("/")[1]) - 1
-                if months_list[date_month] not in monthly_dic_total.keys():
-                    monthly_dic_total[months_list[date_month]] = {
-                        "expenses": total,
-                        "incomes": float(0)
-                    }
-                else:
-                     monthly_dic_total[months_list[date_month]]["expenses"] += total
+            # Keyed by month and year (e.g. October 2026)
+            for (_, date_month), total in with_calendar(expenses.reset_index()).groupby(["year_month", "month_name"]).cost.sum().items():
+                monthly_dic_total[date_month] = {
+                    "expenses": total,
+                    "incomes": float(0)
+                }
 
 
-            for date, total in incomes.items():
-                date_month = int(date.split("/")[1]) - 1
-                if months_list[date_month] not in monthly_dic_total.keys():
-                    monthly_dic_total[months_list[date_month]] = {
+            for (_, date_month), total in with_calendar(incomes.reset_index()).groupby(["year_month", "month_name"]).cost.sum().items():
+                if date_month not in monthly_dic_total.keys():
+                    monthly_dic_total[date_month] = {
                         "expenses": float(0),
                         "incomes": total
                     }
                 else:
-                    monthly_dic_total[months_list[date_month]]["incomes"] += total
+                    monthly_dic_total[date_month]["incomes"] += total
 
 
 
@@ -522,15 +1112,14 @@ def get_totals_by_period(period):
 
 def get_category_breakdown(period=None):
     """ Gets breakdown of user spending categories over a certain period """
-    global formatted_date, week_number, month_number
     with app.app_context():
         categories = ["Food & Groceries", "Shopping & Entertainemnt", "Housing & Rent", "Transport", "Health & Personal"]
-        df_expenses = pd.read_sql_table("expenses", engine)
-        expenses = df_expenses[df_expenses["users_id"] == current_user.get_id()]
+        df_expenses = read_transactions("expenses")
+        expenses = df_expenses[df_expenses["users_id"] == int(current_user.get_id())]
 
         if period == "daily":
             daily_break_down = {}
-            df_today_total = expenses[expenses["date"] == formatted_date]
+            df_today_total = expenses[expenses["date"] == current_date()]
             if df_today_total.empty:
                 return None
 
@@ -544,23 +1133,14 @@ def get_category_breakdown(period=None):
 
         elif period == "weekly":
             weekly_break_down = {}
-            weekly_total = 0
-            for index, row in df_expenses.iterrows():
-                date_week_number = datetime.strptime(row["date"], "%d/%m/%Y").isocalendar()[1]
-                if date_week_number == week_number:
-                    weekly_total += row["cost"]
-
-
+            df_week_total = with_calendar(expenses)
+            df_week_total = df_week_total[df_week_total["year_week"] == current_year_week()]
+            if df_week_total.empty:
+                return None
 
+            weekly_total = df_week_total.cost.sum()
             for category in categories:
-                category_summary = expenses[expenses["category"] == category]
-
-                category_total = 0
-                for index, row in category_summary.iterrows():
-                    date_week_number = datetime.strptime(row["date"], "%d/%m/%Y").isocalendar()[1]
-                    if date_week_number == week_number:
-                        category_total += row["cost"]
-
+                category_total = df_week_total[df_week_total["category"] == category].cost.sum()
                 percentage = round((category_total / weekly_total) * 100, 2)
                 weekly_break_down[category] = f"{percentage}%"
 
@@ -568,21 +1148,14 @@ def get_category_breakdown(period=None):
 
         elif period == "monthly":
             monthly_break_down = {}
-            monthly_total = 0
-            for index, row in expenses.iterrows():
-                date_month = int(row["date"].split("/")[1])
-                if date_month == month_number:
-                    monthly_total += row["cost"]
-
+            df_month_total = with_calendar(expenses)
+            df_month_total = df_month_total[df_month_total["year_month"] == current_year_month()]
+            if df_month_total.empty:
+                return None
 
+            monthly_total = df_month_total.cost.sum()
             for category in categories:
-                category_summary = expenses[expenses["category"] == category]
-                category_total = 0
-                for index, row in category_summary.iterrows():
-                    row_month_number = int(row["date"].split("/")[1])
-                    if row_month_number == month_number:
-                        category_total += row["cost"]
-
+                category_total = df_month_total[df_month_total["category"] == category].cost.sum()
                 percentage = round((category_total / monthly_total) * 100, 2)
                 monthly_break_down[category] = f"{percentage}%"
 
@@ -607,13 +1180,13 @@ def top_spending_categories():
     """returns the top 3 spending categories since account creation"""
     categories = ["Food & Groceries", "Shopping & Entertainment", "Housing & Rent", "Transport", "Health & Personal"]
     with app.app_context():
-        df_expenses = pd.read_sql_table("expenses", engine)
-        expenses = df_expenses[df_expenses["users_id"] == current_user.get_id()]
+        df_expenses = read_transactions("expenses")
+        expenses = df_expenses[df_expenses["users_id"] == int(current_user.get_id())]
         if not expenses:
             return None
         summarised_categories = {}
         for c in categories:
-            summarised_categories[c] = float(expenses[(expenses["category"] == c) & (expenses["users_id"] == current_user.get_id())].cost.sum())
+            summarised_categories[c] = float(expenses[(expenses["category"] == c) & (expenses["users_id"] == int(current_user.get_id()))].cost.sum())
 
         top_spending_categories = {}
         while len(top_spending_categories) < 3:
@@ -630,42 +1203,33 @@ def top_spending_categories():
 
 
 def budget_tracker(category=None):
-    global formatted_date, week_number, month_number
     if not category:
         return None
     with app.app_context():
-        df_expenses = pd.read_sql_table("expenses", engine)
-        expenses = df_expenses[df_expenses["users_id"] == current_user.get_id()]
+        df_expenses = read_transactions("expenses")
+        expenses = df_expenses[df_expenses["users_id"] == int(current_user.get_id())]
 
         if expenses.empty:
             return "Please add expenese to allow budget tracking"
 
-        df_budgets = pd.read_sql_table("budgets", engine)
-        budget = df_budgets[(df_budgets["category"] == category) & (df_budgets["users_id"] == current_user.get_id())]
+        df_budgets = pd.read_sql_table("budgets", read_engine())
+        budget = df_budgets[(df_budgets["category"] == category) & (df_budgets["users_id"] == int(current_user.get_id()))]
 
         if budget.empty:
             return "Budget does not exist"
         budget_limit = float(budget["limit"].iloc[0])
         period = budget["time_frame"].iloc[0]
         if period == "daily":
-            category_total = expenses[(expenses["category"] == category) & (expenses["date"] == formatted_date)].cost.sum()
+            category_total = expenses[(expenses["category"] == category) & (expenses["date"] == current_date())].cost.sum()
 
         elif period == "weekly":
-            df_category = expenses[expenses["category"] == category]
-            category_total = 0
-            for index, row in df_category.iterrows():
-                row_date_number = datetime.strptime(row["date"], "%d/%m/%Y").isocalendar()[1]
-                if row_date_number == week_number:
-                    category_total += float(row["cost"])
+            df_category = with_calendar(expenses[expenses["category"] == category])
+            category_total = float(df_category[df_category["year_week"] == current_year_week()].cost.sum())
 
 
         elif period == "monthly":
-            df_category = expenses[expenses["category"] == category]
-            category_total = 0
-            for index, row in df_category.iterrows():
-                row_date_month_number = int(row["date"].split("/")[1])
-                if row_date_month_number == month_number:
-                    category_total += float(row["cost"])
+            df_category = with_calendar(expenses[expenses["category"] == category])
+            category_total = float(df_category[df_category["year_month"] == current_year_month()].cost.sum())
 
         percentage = (category_total / budget_limit) * 100
         if not category_total <= budget_limit:
@@ -686,10 +1250,10 @@ def budget_tracker(category=None):
 def recent_transactions():
     """Returns a dictionary of the 3 most recent transactions"""
     with app.app_context():
-        df_expenses = pd.read_sql_table("expenses", engine)
-        df_incomes = pd.read_sql_table("incomes", engine)
-        expenses = df_expenses[df_expenses["users_id"] == current_user.get_id()]
-        incomes = df_incomes[df_incomes["users_id"] == current_user.get_id()]
+        df_expenses = pd.read_sql_table("expenses", read_engine())
+        df_incomes = pd.read_sql_table("incomes", read_engine())
+        expenses = df_expenses[df_expenses["users_id"] == int(current_user.get_id())]
+        incomes = df_incomes[df_incomes["users_id"] == int(current_user.get_id())]
 
 
         df_transactions = pd.concat([expenses, incomes], join="outer")
@@ -723,8 +1287,6 @@ def recent_transactions():
 
 # Speding trends over time
 
-print(recent_transactions())
-
 
 
 # plot graphs based o statistics
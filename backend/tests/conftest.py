@@ -0,0 +1,45 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+
+# main.py reads its config at import, so point it at a throwaway database first
+test_dir = tempfile.mkdtemp(prefix="trackwise-tests-")
+os.environ["DB_URI"] = f"sqlite:///{os.path.join(test_dir, 'test.db')}"
+os.environ["ARCHIVE_DIR"] = os.path.join(test_dir, "archive")
+os.environ["FLASK_KEY"] = "test-secret"
+os.environ.pop("DB_REPLICA_URI", None)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import main  # noqa: E402
+
+
+@pytest.fixture()
+def app():
+    with main.app.app_context():
+        main.db.drop_all()
+        main.db.create_all()
+    shutil.rmtree(main.app.config["ARCHIVE_DIR"], ignore_errors=True)
+    yield main.app
+
+
+@pytest.fixture()
+def client(app):
+    client = app.test_client()
+    client.post("/sign-in", query_string={"name": "test", "email": "test@trackwise.test", "password": "test"})
+    return client
+
+
+@pytest.fixture()
+def replica(app, monkeypatch, tmp_path):
+    """Attaches a second SQLite file as the replica bind, empty until synced."""
+    replica_engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'replica.db')}")
+    main.db.metadata.create_all(replica_engine)
+    monkeypatch.setitem(app.config, "REPLICA_LAG_SECONDS", 0.3)
+    with app.app_context():
+        monkeypatch.setitem(main.db.engines, "replica", replica_engine)
+        yield replica_engine
+    replica_engine.dispose()
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+from flask_login import login_user
+
+import main
+
+
+@pytest.fixture()
+def new_years_day(client, app, monkeypatch):
+    """A user with expenses either side of new year, on 01/01/2027 (ISO week 2026-W53)."""
+    monkeypatch.setattr(main, "now", lambda: datetime(2027, 1, 1, 12, 0))
+    with app.app_context():
+        user = main.db.session.execute(main.db.select(main.User)).scalar_one()
+        for date, cost, category in [("02/01/2026", 100, "Food & Groceries"),
+                                     ("28/12/2026", 30, "Food & Groceries"),
+                                     ("31/12/2026", 10, "Transport"),
+                                     ("01/01/2027", 20, "Transport"),
+                                     ("01/01/2027", 20, "Food & Groceries")]:
+            main.db.session.add(main.Expenses(cost=cost, date=date, time="12:00:00", category=category, user=user))
+        main.db.session.add(main.Budgets(limit=100, category="Transport", time_frame="weekly", user=user))
+        main.db.session.commit()
+        user_id = user.id
+    with app.test_request_context():
+        login_user(main.db.session.get(main.User, user_id))
+        yield
+
+
+def test_calendar_table_uses_iso_year_weeks():
+    calendar = main.calendar_table(2026, 2027)
+    assert calendar.loc["01/01/2027", "year_week"] == "2026-W53"
+    assert calendar.loc["04/01/2027", "year_week"] == "2027-W01"
+    assert calendar.loc["01/01/2027", "year_month"] == "2027-01"
+
+
+def test_daily_breakdown(new_years_day):
+    breakdown = main.get_category_breakdown("daily")
+    assert breakdown["Transport"] == "50.0%"
+    assert breakdown["Food & Groceries"] == "50.0%"
+
+
+def test_weekly_breakdown_spans_the_year_boundary(new_years_day):
+    breakdown = main.get_category_breakdown("weekly")
+    assert breakdown["Food & Groceries"] == "62.5%"
+    assert breakdown["Transport"] == "37.5%"
+
+
+def test_monthly_breakdown_keeps_years_apart(new_years_day):
+    breakdown = main.get_category_breakdown("monthly")
+    assert breakdown["Food & Groceries"] == "50.0%"
+    assert breakdown["Transport"] == "50.0%"
+
+
+def test_totals_are_keyed_by_iso_year_week_and_month(new_years_day):
+    weekly = main.get_totals_by_period("weekly")
+    assert weekly["2026-W53"]["expenses"] == 80
+    assert weekly["2026-W01"]["expenses"] == 100
+    monthly = main.get_totals_by_period("monthly")
+    assert monthly["January 2026"]["expenses"] == 100
+    assert monthly["January 2027"]["expenses"] == 40
+
+
+def test_budget_tracker_counts_this_iso_week(new_years_day):
+    category_total, budget_limit, _ = main.budget_tracker("Transport")
+    assert (category_total, budget_limit) == (30, 100)
+
+
+def test_timezone_is_stored_on_the_user(client, app):
+    client.post("/logout")
+    client.post("/login", query_string={"email": "test@trackwise.test", "password": "test",
+                                        "timezone": "Pacific/Kiritimati"})
+    with app.app_context():
+        assert main.db.session.execute(main.db.select(main.User.timezone)).scalar_one() == "Pacific/Kiritimati"
+    # A second device without the setting still gets the user's timezone
+    other_device = app.test_client()
+    other_device.post("/login", query_string={"email": "test@trackwise.test", "password": "test"})
+    kiritimati_date = lambda: datetime.now(main.ZoneInfo("Pacific/Kiritimati")).strftime("%d/%m/%Y")
+    before = kiritimati_date()
+    response = other_device.post("/add-expense", query_string={"cost": 5, "category": "Transport"})
+    after = kiritimati_date()
+    # Either side of a Kiritimati midnight falling during the request
+    assert response.json["success"]["info"]["expense_date"] in (before, after)
@@ -0,0 +1,96 @@
+import gzip
+import json
+import os
+
+import pytest
+from flask_login import login_user
+
+import main
+
+EXPENSES = [("02/01/2020", 10, "Transport"), ("02/01/2020", 5, "Food & Groceries"),
+            ("15/06/2021", 7, "Food & Groceries"), ("20/12/2021", 3, "Transport")]
+
+
+@pytest.fixture()
+def user_id(client, app):
+    with app.app_context():
+        user = main.db.session.execute(main.db.select(main.User)).scalar_one()
+        for date, cost, category in EXPENSES:
+            main.db.session.add(main.Expenses(cost=cost, date=date, time="12:00:00", category=category, user=user))
+        main.db.session.commit()
+        return user.id
+
+
+def analytics(app, user_id):
+    with app.test_request_context():
+        login_user(main.db.session.get(main.User, user_id))
+        return (main.get_totals_by_period("daily"), main.get_totals_by_period("monthly"),
+                main.get_category_breakdown("all-time"))
+
+
+def test_totals_and_breakdowns_survive_archiving(app, user_id):
+    before = analytics(app, user_id)
+    assert before[0]["02/01/2020"]["expenses"] == 15
+    result = app.test_cli_runner().invoke(args=["archive", "--days", "0"])
+    assert "Archived 4 expenses" in result.output
+    with app.app_context():
+        assert main.db.session.execute(main.db.select(main.Expenses)).first() is None
+    assert analytics(app, user_id) == before
+
+
+def test_ranged_list_only_opens_and_returns_archived_rows_in_range(app, client, user_id, monkeypatch):
+    app.test_cli_runner().invoke(args=["archive", "--days", "0"])
+    opened = []
+    real_open = gzip.open
+
+    def recording_open(path, *args):
+        opened.append(os.path.basename(path))
+        return real_open(path, *args)
+
+    monkeypatch.setattr(main.gzip, "open", recording_open)
+
+    response = client.get("/all-expenses", query_string={"start": "01/06/2021", "end": "30/06/2021"})
+
+    assert [expense["date"] for expense in response.json["success"]["expenses"]] == ["15/06/2021"]
+    assert [name.split("-")[0] for name in opened] == ["2021"]
+
+
+def write_tmp_archive(app, user_id, ids):
+    with app.app_context():
+        user_dir = main.archive_user_dir("expenses", user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    path = os.path.join(user_dir, "2020-0.ndjson.gz.tmp")
+    with gzip.open(path, "wt") as archive_file:
+        for expense_id in ids:
+            archive_file.write(json.dumps({"id": expense_id, "cost": 1.0, "date": "01/01/2020", "time": "12:00:00",
+                                           "category": "Transport", "users_id": user_id}) + "\n")
+    return path
+
+
+def test_leftover_tmp_file_is_published_when_its_rows_left_the_hot_table(app, client, user_id):
+    path = write_tmp_archive(app, user_id, [999])
+    app.test_cli_runner().invoke(args=["archive", "--days", "100000"])
+    assert not os.path.exists(path)
+    assert os.path.exists(path.removesuffix(".tmp"))
+    assert len(client.get("/all-expenses").json["success"]["expenses"]) == len(EXPENSES) + 1
+
+
+def test_leftover_tmp_file_is_dropped_when_its_rows_are_still_hot(app, client, user_id):
+    path = write_tmp_archive(app, user_id, [1])
+    app.test_cli_runner().invoke(args=["archive", "--days", "100000"])
+    assert not os.path.exists(path)
+    assert not os.path.exists(path.removesuffix(".tmp"))
+    assert len(client.get("/all-expenses").json["success"]["expenses"]) == len(EXPENSES)
+
+
+def test_logged_out_list_has_no_archive_to_read(app):
+    response = app.test_client().get("/all-expenses")
+    assert response.status_code == 200
+    assert response.json == {"error": {"message": "No expenses found"}}
+    assert app.test_client().get("/all-incomes").json == {"error": {"message": "No incomes found"}}
+
+
+def test_malformed_range_is_rejected(client):
+    response = client.get("/all-expenses", query_string={"start": "2024-01-01"})
+    assert response.status_code == 422
+    assert client.get("/all-incomes", query_string={"end": "31-12-2024"}).status_code == 422
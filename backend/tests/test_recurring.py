@@ -0,0 +1,129 @@
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+from types import SimpleNamespace
+
+from werkzeug.serving import make_server
+
+import main
+
+
+def dates(frequency, start_date, until, after=None):
+    rule = SimpleNamespace(frequency=frequency, start_date=start_date)
+    parse = lambda value: datetime.strptime(value, "%d/%m/%Y")
+    return [day.strftime("%d/%m/%Y") for day in
+            main.occurrence_dates(rule, parse(after) if after else None, parse(until))]
+
+
+def test_monthly_rule_clamps_to_month_end():
+    assert dates("monthly", "31/01/2024", "30/04/2024") == ["31/01/2024", "29/02/2024", "31/03/2024", "30/04/2024"]
+
+
+def test_monthly_rule_resumes_after_materialized_date():
+    assert dates("monthly", "15/01/2025", "20/04/2025", after="15/02/2025") == ["15/03/2025", "15/04/2025"]
+
+
+def test_cron_rule_days_of_month():
+    assert dates("1,15 * *", "01/01/2025", "20/02/2025") == ["01/01/2025", "15/01/2025", "01/02/2025", "15/02/2025"]
+
+
+def test_cron_rule_weekdays_and_months():
+    # Monday to Friday of the first week of March 2025, cron counts Sunday as 0
+    assert dates("* 3 1-5", "01/03/2025", "09/03/2025") == ["03/03/2025", "04/03/2025", "05/03/2025",
+                                                             "06/03/2025", "07/03/2025"]
+
+
+def test_cron_rule_day_of_month_or_weekday():
+    # Like cron, a restricted day-of-month and day-of-week match either one
+    assert dates("10 * 0", "01/06/2025", "15/06/2025") == ["01/06/2025", "08/06/2025", "10/06/2025", "15/06/2025"]
+
+
+def test_invalid_frequency_is_rejected(client):
+    response = client.post("/add-recurring", query_string={"kind": "expenses", "cost": 5, "category": "Rent",
+                                                           "frequency": "32 * *"})
+    assert response.status_code == 422
+
+
+def test_cost_and_category_are_required(client):
+    missing_cost = client.post("/add-recurring", query_string={"kind": "expenses", "category": "Rent", "frequency": "daily"})
+    bad_cost = client.post("/add-recurring", query_string={"kind": "expenses", "cost": "abc", "category": "Rent",
+                                                           "frequency": "daily"})
+    missing_category = client.post("/add-recurring", query_string={"kind": "expenses", "cost": 5, "frequency": "daily"})
+    assert [missing_cost.status_code, bad_cost.status_code, missing_category.status_code] == [422, 422, 422]
+
+
+def test_start_date_far_in_the_past_is_rejected(client):
+    response = client.post("/add-recurring", query_string={"kind": "incomes", "cost": 5, "category": "Salary",
+                                                           "frequency": "daily", "start_date": "01/01/0001"})
+    assert response.status_code == 422
+
+
+def test_concurrent_reads_materialize_each_occurrence_once(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    start_date = (datetime.today() - timedelta(days=300)).strftime("%d/%m/%Y")
+    try:
+        opener.open(urllib.request.Request(
+            f"{base_url}/sign-in?name=race&email=race@trackwise.test&password=race", method="POST")).read()
+        opener.open(urllib.request.Request(
+            f"{base_url}/add-recurring?kind=incomes&cost=10&category=Salary&frequency=daily&start_date={start_date}",
+            method="POST")).read()
+
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def read_incomes():
+            barrier.wait()
+            with opener.open(f"{base_url}/all-incomes") as response:
+                statuses.append(response.status)
+
+        readers = [threading.Thread(target=read_incomes) for _ in range(8)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+    finally:
+        server.shutdown()
+
+    assert statuses == [200] * 8
+    with app.app_context():
+        income_dates = main.db.session.execute(main.db.select(main.Incomes.date)).scalars().all()
+    assert len(income_dates) == len(set(income_dates))
+    assert len(income_dates) == 301
+
+
+def add_daily_salary(client, days_ago):
+    start_date = (datetime.today() - timedelta(days=days_ago)).strftime("%d/%m/%Y")
+    return client.post("/add-recurring", query_string={"kind": "incomes", "cost": 10, "category": "Salary",
+                                                       "frequency": "daily", "start_date": start_date})
+
+
+def test_materialized_occurrences_are_read_back_from_the_primary(client, replica, app):
+    add_daily_salary(client, 5)
+    time.sleep(app.config["REPLICA_LAG_SECONDS"] + 0.1)
+    response = client.get("/all-incomes")
+    assert len(response.json["success"]["budgets"]) == 6
+
+
+def test_forecast_only_projects_the_users_own_rules(client, app):
+    add_daily_salary(client, 0)
+    other_user = app.test_client()
+    other_user.post("/sign-in", query_string={"name": "other", "email": "other@trackwise.test", "password": "other"})
+    until = datetime.today() + timedelta(days=3)
+    with app.test_request_context():
+        owner_id, other_id = main.db.session.execute(main.db.select(main.User.id).order_by(main.User.id)).scalars()
+        assert len(main.projected_transactions("incomes", until, owner_id)) == 3
+        assert main.projected_transactions("incomes", until, other_id) == []
+
+
+def test_other_users_cannot_delete_a_rule(client, app):
+    add_daily_salary(client, 0)
+    other_user = app.test_client()
+    other_user.post("/sign-in", query_string={"name": "other", "email": "other@trackwise.test", "password": "other"})
+    assert other_user.delete("/delete-recurring/1").status_code == 404
+    assert len(client.get("/all-recurring").json["success"]["recurring"]) == 1
+    assert client.delete("/delete-recurring/1").status_code == 200
@@ -0,0 +1,29 @@
+import time
+
+import main
+
+
+def wait_out_read_your_writes():
+    time.sleep(main.app.config["REPLICA_LAG_SECONDS"] + 0.1)
+
+
+def test_reads_right_after_a_write_use_the_primary(client, replica):
+    client.post("/add-expense", query_string={"cost": 5, "category": "Transport"})
+    response = client.get("/all-expenses")
+    assert len(response.json["success"]["expenses"]) == 1
+
+
+def test_reads_go_to_the_replica_once_the_window_passes(client, replica):
+    client.post("/add-expense", query_string={"cost": 5, "category": "Transport"})
+    wait_out_read_your_writes()
+    response = client.get("/all-expenses")
+    assert response.json == {"error": {"message": "No expenses found"}}
+
+
+def test_sync_replica_copies_the_primary(app, client, replica):
+    client.post("/add-expense", query_string={"cost": 5, "category": "Transport"})
+    result = app.test_cli_runner().invoke(args=["sync-replica"])
+    assert "Replica synced" in result.output
+    wait_out_read_your_writes()
+    response = client.get("/all-expenses")
+    assert len(response.json["success"]["expenses"]) == 1